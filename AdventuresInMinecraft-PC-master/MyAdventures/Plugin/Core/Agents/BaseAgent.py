@@ -1,9 +1,11 @@
 # core/agent_base.py
 
 import asyncio
-from enum import Enum
-from typing import Any, Dict, Optional
-import datetime
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from enum import IntEnum
+from typing import Any, ClassVar, Dict, Optional
+import time
 
 from ..Logger.logging_config import get_logger
 
@@ -13,13 +15,32 @@ logger = get_logger(__name__)
 # ---------------------------------------------------------
 #  Unified Agent States
 # ---------------------------------------------------------
-class AgentState(Enum):
-    IDLE = "IDLE"
-    RUNNING = "RUNNING"
-    PAUSED = "PAUSED"
-    WAITING = "WAITING"
-    STOPPED = "STOPPED"
-    ERROR = "ERROR"
+class AgentState(IntEnum):
+    # Los estados terminales (STOPPED, ERROR) van al final: el loop
+    # los detecta con una sola comparación entera (state >= STOPPED)
+    IDLE = 0
+    RUNNING = 1
+    PAUSED = 2
+    WAITING = 3
+    STOPPED = 4
+    ERROR = 5
+
+
+# ---------------------------------------------------------
+#  Timestamps
+# ---------------------------------------------------------
+_ts_second = -1
+_ts_prefix = ""
+
+
+def _utc_timestamp() -> str:
+    """ISO-8601 UTC con milisegundos; el prefijo por segundo se cachea."""
+    global _ts_second, _ts_prefix
+    sec, ns = divmod(time.time_ns(), 1_000_000_000)
+    if sec != _ts_second:
+        _ts_second = sec
+        _ts_prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(sec))
+    return f"{_ts_prefix}.{ns // 1_000_000:03d}Z"
 
 
 # ---------------------------------------------------------
@@ -34,15 +55,53 @@ class BaseAgent:
       - no deadlocks or self-await errors
     """
 
+    __slots__ = (
+        "agent_id",
+        "bus",
+        "_state",
+        "_state_reason",
+        "_task",
+        "_should_stop",
+        "_msg_template",
+        "_lifecycle_lock",
+        "_resume_event",
+        "_tick_time",
+    )
+
+    # True si la subclase implementa perceive() como método síncrono
+    # (solo lee estado local): el loop lo llama sin crear una corrutina
+    _PERCEIVE_IS_TRIVIAL: ClassVar[bool] = False
+
+    # Un único hilo compartido para checkpoints: el I/O no bloquea el loop
+    _checkpoint_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint")
+
     def __init__(self, agent_id: str, bus=None):
         self.agent_id = agent_id
         self.bus = bus
 
         self._state: AgentState = AgentState.IDLE
+        self._state_reason = ""
         self._task: Optional[asyncio.Task] = None
         self._should_stop = False
+        # Plantilla de mensaje con las claves ya en orden: build_message la copia
+        self._msg_template = {
+            "type": "",
+            "source": agent_id,
+            "target": "",
+            "timestamp": "",
+            "payload": None,
+            "status": "SUCCESS",
+            "context": None,
+        }
+        self._lifecycle_lock: Optional[asyncio.Lock] = None
+        # Instante (monotonic) del tick en curso: un único reloj por ciclo PDA
+        self._tick_time = 0.0
 
-        logger.info(f"[INIT] Agent '{agent_id}' created")
+        # Abierto en cualquier estado salvo PAUSED: el loop duerme en él
+        self._resume_event = asyncio.Event()
+        self._resume_event.set()
+
+        logger.info("[INIT] Agent '%s' created", agent_id)
 
     # -----------------------------------------------------
     #  State helpers
@@ -53,48 +112,66 @@ class BaseAgent:
 
     def set_state(self, new_state: AgentState, reason: str = ""):
         prev = self._state
+        # Mismo estado y motivo: nada que notificar ni registrar
+        if new_state == prev and reason == self._state_reason:
+            return
         self._state = new_state
-        logger.info(
-            f"[STATE] {self.agent_id}: {prev.value} → {new_state.value} | reason={reason}"
-        )
+        self._state_reason = reason
+        if new_state == AgentState.PAUSED:
+            self._resume_event.clear()
+        else:
+            self._resume_event.set()
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "[STATE] %s: %s → %s | reason=%s",
+                self.agent_id, prev.name, new_state.name, reason,
+            )
 
     # -----------------------------------------------------
     #  Control commands
     # -----------------------------------------------------
+    def _get_lifecycle_lock(self) -> asyncio.Lock:
+        # Creado bajo demanda, ya dentro del event loop
+        if self._lifecycle_lock is None:
+            self._lifecycle_lock = asyncio.Lock()
+        return self._lifecycle_lock
+
     async def start(self):
         """Start the agent loop (safe)."""
-        if self._task and not self._task.done():
-            logger.warning(f"[START] Agent '{self.agent_id}' already running")
-            return
+        async with self._get_lifecycle_lock():
+            if self._task and not self._task.done():
+                logger.warning("[START] Agent '%s' already running", self.agent_id)
+                return
 
-        self._should_stop = False
-        self.set_state(AgentState.RUNNING, "start")
+            self._should_stop = False
+            self.set_state(AgentState.RUNNING, "start")
 
-        self._task = asyncio.create_task(self._run_loop())
-        logger.info(f"[START] Agent '{self.agent_id}' started")
+            self._task = asyncio.create_task(self._run_loop())
+            logger.info("[START] Agent '%s' started", self.agent_id)
 
     async def stop(self):
         """Stop the agent WITHOUT causing it to await on itself."""
-        logger.info(f"[STOP] Stopping agent '{self.agent_id}'...")
-
-        self._should_stop = True
-
-        # If stop() was called from another task → safe await
-        if (
-            self._task
-            and not self._task.done()
-            and asyncio.current_task() is not self._task
-        ):
-            self._task.cancel()
-            try:
-                await self._task
-            except asyncio.CancelledError:
-                pass
-            except Exception as e:
-                logger.error(f"[STOP ERROR] {e}")
-
-        self.set_state(AgentState.STOPPED, "stop command")
-        await self.save_checkpoint()
+        async with self._get_lifecycle_lock():
+            logger.info("[STOP] Stopping agent '%s'...", self.agent_id)
+
+            self._should_stop = True
+
+            # If stop() was called from another task → safe await
+            if (
+                self._task
+                and not self._task.done()
+                and asyncio.current_task() is not self._task
+            ):
+                self._task.cancel()
+                try:
+                    await self._task
+                except asyncio.CancelledError:
+                    pass
+                except Exception as e:
+                    logger.error("[STOP ERROR] %s", e)
+
+            self.set_state(AgentState.STOPPED, "stop command")
+            await self.save_checkpoint()
 
     async def pause(self):
         self.set_state(AgentState.PAUSED, "pause command")
@@ -108,24 +185,32 @@ class BaseAgent:
             self.set_state(AgentState.RUNNING, "resume command")
 
     async def update(self, params: Dict[str, Any]):
-        logger.info(f"[UPDATE] {self.agent_id} updated with params={params}")
+        logger.info("[UPDATE] %s updated with params=%s", self.agent_id, params)
 
     # -----------------------------------------------------
     #  PDA LOOP
     # -----------------------------------------------------
     async def _run_loop(self):
         """Core perception-decision-action loop."""
+        ticks = 0
         try:
             while not self._should_stop:
-                if self.state == AgentState.PAUSED:
-                    await asyncio.sleep(0.1)
+                state = self._state
+                if state == AgentState.PAUSED:
+                    # Sin sondeo: despierta cuando se sale de PAUSED
+                    await self._resume_event.wait()
                     continue
 
-                if self.state in (AgentState.STOPPED, AgentState.ERROR):
+                if state >= AgentState.STOPPED:
                     break
 
+                self._tick_time = time.monotonic()
+
                 # --- Perceive
-                percept = await self.perceive()
+                if self._PERCEIVE_IS_TRIVIAL:
+                    percept = self.perceive()
+                else:
+                    percept = await self.perceive()
 
                 # --- Decide
                 decision = await self.decide(percept)
@@ -133,14 +218,18 @@ class BaseAgent:
                 # --- Act
                 await self.act(decision)
 
-                await asyncio.sleep(0)  # yield control
+                # perceive/decide/act ya ceden el control cuando esperan;
+                # solo se fuerza un yield cada 64 ticks para no acaparar el loop
+                ticks += 1
+                if not ticks & 0x3F:
+                    await asyncio.sleep(0)
 
         except asyncio.CancelledError:
             # Normal shutdown → no log spam, no await stop()
             return
 
         except Exception as e:
-            logger.exception(f"[ERROR] Agent '{self.agent_id}' crashed: {e}")
+            logger.exception("[ERROR] Agent '%s' crashed: %s", self.agent_id, e)
             self.set_state(AgentState.ERROR, str(e))
             await self.save_checkpoint()
 
@@ -165,20 +254,41 @@ class BaseAgent:
     #  Checkpoint
     # -----------------------------------------------------
     async def save_checkpoint(self):
-        logger.info(f"[CHECKPOINT] Saved data for {self.agent_id}")
+        """Ejecuta _save_checkpoint_sync en el executor de checkpoints."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._checkpoint_executor, self._save_checkpoint_sync)
+
+    def _save_checkpoint_sync(self):
+        """Persistencia síncrona del checkpoint (sobrescribir en subclases)."""
+        logger.info("[CHECKPOINT] Saved data for %s", self.agent_id)
 
 
     # -----------------------------------------------------
     #  Messages
     # -----------------------------------------------------
     def build_message(self, msg_type: str, target: str, payload: dict, status="SUCCESS", context=None):
-        return {
-            "type": msg_type,
-            "source": self.agent_id,
-            "target": target,
-            "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
-            "payload": payload,
-            "status": status,
-            "context": context or {}
-        }
+        msg = self._msg_template.copy()
+        msg["type"] = msg_type
+        msg["target"] = target
+        msg["timestamp"] = _utc_timestamp()
+        msg["payload"] = payload
+        msg["status"] = status
+        msg["context"] = context or {}
+        return msg
+
+    def message_scaffold(self, msg_type: str, target: str) -> dict:
+        """Esqueleto fijo (type/source/target) para un mensaje que se publica a menudo."""
+        scaffold = self._msg_template.copy()
+        scaffold["type"] = msg_type
+        scaffold["target"] = target
+        return scaffold
+
+    def fill_message(self, scaffold: dict, payload: dict, status="SUCCESS", context=None):
+        """Como build_message, pero partiendo de un esqueleto precalculado."""
+        msg = scaffold.copy()
+        msg["timestamp"] = _utc_timestamp()
+        msg["payload"] = payload
+        msg["status"] = status
+        msg["context"] = context or {}
+        return msg
 
@@ -1,98 +1,366 @@
 # agents/builder/builder_bot.py
 import asyncio
 import os
+from bisect import bisect_left
+import pickle
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from array import array
 from mcpi.minecraft import Minecraft
 mc = Minecraft.create()
 from mcpi.block import AIR, BLOCK_MAP, Block
 from pathlib import Path
+from types import MappingProxyType
 from Plugin.Schematics.schematic_loader import load_schematic, parse_schematic, schematic_to_blocks
-from typing import Dict, Any, Optional
+from typing import Dict, Any, NamedTuple, Optional, Tuple
 from ..BaseAgent import BaseAgent, AgentState
+from ...Bus.Bus import bus_sync
 from ...Logger.logging_config import get_logger
 
 logger = get_logger(__name__)
 
 ROOT_DIR = Path(__file__).resolve().parents[3]
 TEMPLATE_DIR = ROOT_DIR / "Schematics"
-TEMPLATES = {}
+CACHE_DIR = TEMPLATE_DIR / ".cache"
+CACHE_VERSION = 6
+# Las plantillas son de solo lectura: se registran en _TEMPLATES y se
+# exponen a través de un proxy inmutable
+_TEMPLATES = {}
+TEMPLATES = MappingProxyType(_TEMPLATES)
+_templates_loaded = False
+_templates_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
+def _resolve_block_cached(name: str):
+    """
+    Nombre de bloque del .schem -> (block_id, data) de MCPI, ignorando las
+    propiedades entre corchetes. Los materiales desconocidos se tratan como AIR.
+    """
+    base_name = name.split("[")[0]  # elimina propiedades tipo [east=true,...]
+    block = BLOCK_MAP.get(base_name)
+    if block is None:
+        logger.warning("[BUILDER] Unknown material %s, skipping", name)
+        block = AIR  # fallback
+    return block.id, block.data
+
+
+def _read_template_cache(name, key):
+    """Devuelve la plantilla cacheada si la clave (mtime, size) coincide."""
+    cache_path = CACHE_DIR / f"{name}.pkl"
+    try:
+        with open(cache_path, "rb") as f:
+            version, cached_key, data = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+        return None
+
+    if version != CACHE_VERSION or cached_key != key:
+        return None
+    return data
+
+
+def _write_template_cache(name, key, data):
+    """Guarda la plantilla parseada de forma atómica (tmp + os.replace)."""
+    cache_path = CACHE_DIR / f"{name}.pkl"
+    tmp_path = cache_path.with_suffix(".tmp")
+    try:
+        CACHE_DIR.mkdir(exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            pickle.dump((CACHE_VERSION, key, data), f, protocol=5)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning("[BUILDER] Could not cache template '%s': %s", name, e)
+
+
+def _blocks_to_soa(blocks):
+    """
+    Convierte la lista (x, y, z, blockstate) en arrays paralelos:
+    xs/ys/zs (int16), mat (índice en palette) y palette (nombres).
+    Los bloques de aire se descartan aquí, así que no llegan ni al recuento
+    de materiales ni al plan de construcción.
+    Los arrays se guardan ya ordenados por (y, mat, z, x): cada capa es un
+    tramo contiguo y el plan sale agrupado por material sin reordenar.
+    """
+    xs, ys, zs, mat = array("h"), array("h"), array("h"), array("H")
+    palette = []
+    palette_ids = {}
+
+    for x, y, z, block in blocks:
+        if block == "minecraft:air":
+            continue
+        mat_id = palette_ids.get(block)
+        if mat_id is None:
+            mat_id = palette_ids[block] = len(palette)
+            palette.append(block)
+        xs.append(x)
+        ys.append(y)
+        zs.append(z)
+        mat.append(mat_id)
+
+    order = sorted(range(len(xs)), key=lambda i: (ys[i], mat[i], zs[i], xs[i]))
+
+    return {
+        "xs": array("h", [xs[i] for i in order]),
+        "ys": array("h", [ys[i] for i in order]),
+        "zs": array("h", [zs[i] for i in order]),
+        "mat": array("H", [mat[i] for i in order]),
+        "palette": tuple(palette),
+    }
+
+
+def _parse_template(name, path, key):
+    """Parsea un .schem (cache miss) y guarda el resultado en la caché de disco."""
+    logger.info("[BUILDER] Loading template '%s' (%s)...", name, os.path.basename(path))
+    try:
+        nbt = load_schematic(path)
+        struct = parse_schematic(nbt)
+        soa = _blocks_to_soa(schematic_to_blocks(struct))
+
+        # Build material count (un único Counter en C sobre los índices)
+        palette = soa["palette"]
+        materials = {
+            palette[mat_id]: count
+            for mat_id, count in Counter(soa["mat"]).items()
+        }
+
+        width, height, depth = struct["size"]
+    except Exception as e:
+        logger.error("[BUILDER] ERROR loading %s: %s", os.path.basename(path), e)
+        return None
+
+    data = {
+        "width": width,
+        "height": height,
+        "depth": depth,
+        "materials": materials,
+        **soa,
+    }
+    _write_template_cache(name, key, data)
+    return data
+
+
+class BuildLayer(NamedTuple):
+    """
+    Una capa del plan: sus bloques son el tramo [start, stop) de los arrays
+    de la plantilla (sin copiarlos) y segments los rectángulos a colocar.
+    """
+    y: int
+    start: int
+    stop: int
+    segments: Tuple[Tuple[int, int, int, int, int], ...]
+
+
+def _layer_segments(xs, zs, mat_ids):
+    """
+    Compacta los bloques de una capa en rectángulos de un solo material.
+    Espera los bloques ordenados por (mat, z, x): primero se forman tramos
+    contiguos sobre x y después se fusionan tramos idénticos de filas z
+    consecutivas. Devuelve una tupla de (x1, z1, x2, z2, mat_id).
+    """
+    runs = []  # (x1, x2, z, mat_id)
+    for x, z, mat_id in zip(xs, zs, mat_ids):
+        if runs:
+            x1, x2, rz, rmat = runs[-1]
+            if rz == z and rmat == mat_id and x2 + 1 == x:
+                runs[-1] = (x1, x, rz, rmat)
+                continue
+        runs.append((x, x, z, mat_id))
+
+    rects = []
+    open_rects = {}  # (x1, x2, mat_id) -> índice en rects
+    for x1, x2, z, mat_id in runs:
+        key = (x1, x2, mat_id)
+        idx = open_rects.get(key)
+        if idx is not None and rects[idx][3] == z - 1:
+            rx1, rz1, rx2, _, rmat = rects[idx]
+            rects[idx] = (rx1, rz1, rx2, z, rmat)
+        else:
+            open_rects[key] = len(rects)
+            rects.append((x1, z, x2, z, mat_id))
+    return tuple(rects)
+
+
+def _make_layers(data):
+    """
+    Plan de construcción de una plantilla: una BuildLayer por altura.
+    Los arrays ya están ordenados por y, así que cada capa es un slice.
+    """
+    t_ys = data["ys"]
+    # memoryview: los tramos de cada capa se recorren sin copiar los arrays
+    t_xs, t_zs, t_mat = memoryview(data["xs"]), memoryview(data["zs"]), memoryview(data["mat"])
+    height = data["height"]
+    bounds = [bisect_left(t_ys, y) for y in range(height + 1)]
+
+    return tuple(
+        BuildLayer(y, lo, hi, _layer_segments(t_xs[lo:hi], t_zs[lo:hi], t_mat[lo:hi]))
+        for y, lo, hi in zip(range(height), bounds, bounds[1:])
+    )
+
+
+def _register_template(name, data):
+    """Publica la plantilla en TEMPLATES con la paleta ya resuelta."""
+    width, height, depth = data["width"], data["height"], data["depth"]
+
+    # Nombres internados (también tras leer la caché): las claves del BOM y
+    # del inventario son el mismo objeto y el lookup se resuelve por identidad
+    palette = tuple(sys.intern(block_name) for block_name in data["palette"])
+    materials = {sys.intern(block_name): count for block_name, count in data["materials"].items()}
+
+    # Resolver la paleta a (id, data) de MCPI una sola vez por carga:
+    # el bucle de construcción solo indexa estos arrays
+    resolved = [_resolve_block_cached(block_name) for block_name in palette]
+
+    # BOM memoizado por plantilla: pares (material, cantidad)
+    bom_items = tuple(materials.items())
+
+    _TEMPLATES[name] = MappingProxyType({
+        **data,
+        "palette": palette,
+        "materials": MappingProxyType(materials),
+        "bom_items": bom_items,
+        "block_ids": array("H", (bid for bid, _ in resolved)),
+        "block_data": array("H", (bdat for _, bdat in resolved)),
+        # El plan depende solo de la plantilla: se calcula una vez por carga
+        # y todas las construcciones comparten la misma tupla de capas
+        "plan": _make_layers(data),
+    })
+
+    logger.info("[BUILDER] Loaded template '%s' (%s×%s×%s, %s blocks)",
+                name, width, height, depth, len(data["xs"]))
+
 
 def load_all_templates():
     logger.info("[BUILDER] Loading templates from ./Schematics/")
 
     if not os.path.isdir(TEMPLATE_DIR):
-        logger.warning(f"[BUILDER] Template folder '{TEMPLATE_DIR}' does not exist")
+        logger.warning("[BUILDER] Template folder '%s' does not exist", TEMPLATE_DIR)
         return
 
-    for file in os.listdir(TEMPLATE_DIR):
-        if not file.endswith(".schem"):
+    with os.scandir(TEMPLATE_DIR) as it:
+        entries = [e for e in it if e.is_file() and e.name.endswith(".schem")]
+
+    # Los aciertos de caché se registran en serie; los .schem a parsear
+    # (descompresión gzip + NBT) se reparten entre varios hilos
+    misses = []
+    for entry in entries:
+        name = entry.name[:-len(".schem")]
+        try:
+            st = entry.stat()
+        except OSError as e:
+            logger.error("[BUILDER] ERROR loading %s: %s", entry.name, e)
             continue
 
-        name = file.replace(".schem", "")
-        path = os.path.join(TEMPLATE_DIR, file)
+        key = (st.st_mtime_ns, st.st_size)
+        data = _read_template_cache(name, key)
+        if data is None:
+            misses.append((name, entry.path, key))
+        else:
+            logger.info("[BUILDER] Loading template '%s' from cache", name)
+            _register_template(name, data)
 
-        try:
-            logger.info(f"[BUILDER] Loading template '{name}' ({file})...")
-            nbt = load_schematic(path)
-            struct = parse_schematic(nbt)
-            blocks = schematic_to_blocks(struct)
-
-            # Build material count
-            materials = {}
-            for (_, _, _, block) in blocks:
-                if block != "minecraft:air":
-                    materials[block] = materials.get(block, 0) + 1
-
-            width, height, depth = struct["size"]
-
-            TEMPLATES[name] = {
-                "width": width,
-                "height": height,
-                "depth": depth,
-                "materials": materials,
-                "blocks": blocks,
-            }
-
-            logger.info(f"[BUILDER] Loaded template '{name}' "
-                        f"({width}×{height}×{depth}, {len(blocks)} blocks)")
+    if not misses:
+        return
 
-        except Exception as e:
-            logger.error(f"[BUILDER] ERROR loading {file}: {e}")
+    workers = min(8, os.cpu_count() or 1, len(misses))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="template") as ex:
+        results = list(ex.map(lambda m: _parse_template(*m), misses))
+
+    for (name, _, _), data in zip(misses, results):
+        if data is not None:
+            _register_template(name, data)
+
+
+def _ensure_templates_loaded():
+    """Carga las plantillas una sola vez por proceso."""
+    global _templates_loaded
+    if _templates_loaded:
+        return
+    with _templates_lock:
+        if not _templates_loaded:
+            load_all_templates()
+            _templates_loaded = True
 
 
 class BuilderBot(BaseAgent):
 
-    BUILD_INTERVAL = 0.01
+    __slots__ = (
+        "_last_map",
+        "_build_origin",
+        "_template_name",
+        "_template_ctx",
+        "_bom",
+        "_bom_items",
+        "_material_inventory",
+        "_material_inventory_view",
+        "_build_progress",
+        "_build_plan",
+        "_last_yield",
+        "_block_ids",
+        "_block_data",
+        "_map_event",
+        "_cmd_table",
+        "_bom_msg",
+        "_status_msg",
+    )
+
+    # Presupuesto de tiempo (s) colocando bloques antes de ceder el event loop
+    BUILD_INTERVAL = 0.005
+    _PERCEIVE_IS_TRIVIAL = True
 
     def __init__(self, agent_id="BuilderBot", bus=None):
         super().__init__(agent_id, bus)
         
-        load_all_templates()
+        _ensure_templates_loaded()
  
         self._last_map: Optional[Dict[str, Any]] = None
+        self._build_origin: Optional[Tuple[int, int, int]] = None
         self._template_name = list(TEMPLATES.keys())[0]  # default first template
+        # Contexto compartido por todos los mensajes de la plantilla actual:
+        # de solo lectura, así que puede reutilizarse en cada publicación
+        self._template_ctx = MappingProxyType({"template": self._template_name})
         self._bom = None
-        self._material_inventory = {}
+        self._bom_items = ()
+        self._material_inventory: Dict[str, int] = {}
+        # Vista de solo lectura que se entrega en perceive (sin copias por tick)
+        self._material_inventory_view = MappingProxyType(self._material_inventory)
         self._build_progress = 0
         self._build_plan = None
+        # Última vez que la construcción cedió el event loop (entre capas)
+        self._last_yield = 0.0
+        self._block_ids = array("H")
+        self._block_data = array("H")
         self._map_event = asyncio.Event()
 
+        # Esqueletos de los mensajes que se publican en cada build
+        self._bom_msg = self.message_scaffold("materials.requirements.v1", "MinerBot")
+        self._status_msg = self.message_scaffold("build.v1", "*")
+
+        # Tabla de despacho: tipo de comando completo -> handler. El bus ya
+        # entrega por tipo exacto, así que basta un lookup sin partir el tipo
+        self._cmd_table = {
+            "command.builder.pause.v1": self.pause,
+            "command.builder.resume.v1": self.resume,
+            "command.builder.stop.v1": self.stop,
+            "command.builder.list.v1": self.list,
+        }
+
         # Inicializar estado activo esperando mapas
         self.set_state(AgentState.WAITING, "Waiting for map")
 
-        self.bus.subscribe("map.v1", self._on_map)
-        self.bus.subscribe("inventory.v1", self._on_inventory)
-        self.bus.subscribe("command.builder.start.v1", self._on_start_cmd)
-        self.bus.subscribe("command.builder.set.v1", self._on_update_cmd)
-        self.bus.subscribe("command.builder.list.v1", self._on_control)
-        self.bus.subscribe("command.*.v1", self._on_control)
-        self.bus.subscribe("*", self._on_generic)
+        # El bus solo entrega los mensajes dirigidos a este agente o a "*"
+        self.bus.subscribe("map.v1", self._on_map, target=self.agent_id)
+        self.bus.subscribe("inventory.v1", self._on_inventory, target=self.agent_id)
+        self.bus.subscribe("command.builder.start.v1", self._on_start_cmd, target=self.agent_id)
+        self.bus.subscribe("command.builder.set.v1", self._on_update_cmd, target=self.agent_id)
+        for cmd_type in self._cmd_table:
+            self.bus.subscribe(cmd_type, self._on_control, target=self.agent_id)
 
     # ============ MESSAGE HANDLERS ====================
     async def _on_map(self, msg):
-        if msg.get("target") not in (self.agent_id, "*"):
-            return
-
-        payload = msg.get("payload", {})
+        payload = msg.get("payload") or {}
         rect = payload.get("best_rectangle")
 
         if rect is None:
@@ -109,37 +377,48 @@ class BuilderBot(BaseAgent):
         tpl_d = tpl["depth"]
 
         logger.info(
-            f"[BUILDER] Received rectangle {rect_width}×{rect_depth} "
-            f"for template '{self._template_name}' ({tpl_w}×{tpl_d})"
+            "[BUILDER] Received rectangle %s×%s for template '%s' (%s×%s)",
+            rect_width, rect_depth, self._template_name, tpl_w, tpl_d
         )
 
         # --- VALIDATION ---
         if rect_width < tpl_w or rect_depth < tpl_d:
             logger.warning(
-                f"[BUILDER] Flat area too small. Needed at least {tpl_w}×{tpl_d}, "
-                f"got {rect_width}×{rect_depth}. Waiting for new map…"
+                "[BUILDER] Flat area too small. Needed at least %s×%s, "
+                "got %s×%s. Waiting for new map…",
+                tpl_w, tpl_d, rect_width, rect_depth
             )
             return  # NO aceptamos este mapa
 
         # If valid:
         self._last_map = payload
+
+        # Origen absoluto de la construcción, calculado una vez por mapa.
+        # Algunos mapas no tienen x/z, usar fallback 0; si el mapa no da
+        # altura base se asume 0
+        self._build_origin = (
+            rect.get("x", rect.get("x1", 0)),
+            rect.get("y", 0),
+            rect.get("z", rect.get("z1", 0)),
+        )
         logger.info("[MAP] Accepted map from %s", msg["source"])
 
         self._map_event.set()
         self.set_state(AgentState.RUNNING, "Processing map")
 
-    async def _on_inventory(self, msg):
-        if msg.get("target") not in (self.agent_id, "*"):
-            return
+    @bus_sync
+    def _on_inventory(self, msg):
+        payload = msg.get("payload") or {}
+        if payload == self._material_inventory:
+            return  # inventario sin cambios: nada que copiar ni registrar
 
-        payload = msg.get("payload", {})
-        self._material_inventory = payload
+        # Un único dict propio actualizado in situ: no compartimos el payload del emisor
+        self._material_inventory.clear()
+        self._material_inventory.update(payload)
         logger.info("[INVENTORY] Updated: %s", payload)
         
     async def _on_start_cmd(self, msg: Dict[str, Any]):
         """Handle `builder start.`"""
-        if msg.get("target") not in (self.agent_id, "*"):
-            return
         logger.info("[BUILDER] Start request")
 
         # If the bot is running, queue new scan
@@ -149,10 +428,7 @@ class BuilderBot(BaseAgent):
 
     async def _on_update_cmd(self, msg: Dict[str, Any]):
         """Handle `explorer set` command with optional parameters in payload."""
-        if msg.get("target") not in (self.agent_id, "*"):
-            return
-
-        payload = msg.get("payload", {})
+        payload = msg.get("payload") or {}
 
         # Actualizar rango si viene en payload
         if "schem" in payload:
@@ -161,35 +437,23 @@ class BuilderBot(BaseAgent):
                 return
 
             self._template_name = name
+            self._template_ctx = MappingProxyType({"template": name})
         # Llamar a update del BaseAgent para cualquier otro parámetro general
         await super().update(payload)
 
 
     async def _on_control(self, msg: Dict[str, Any]):
         """pause/resume/stop commands"""
-        if msg.get("target") not in (self.agent_id, "*"):
-            return
-
-        cmdtype = msg.get("type", "")
-        if cmdtype.endswith(".pause.v1"):
-            await self.pause()
-        elif cmdtype.endswith(".resume.v1"):
-            await self.resume()
-        elif cmdtype.endswith(".stop.v1"):
-            await self.stop()
-        elif cmdtype.endswith(".list.v1"):
-            await self.list()
-
-    async def _on_generic(self, msg: Dict[str, Any]):
-        # Debug tap for other messages
-        return
+        handler = self._cmd_table.get(msg.get("type"))
+        if handler is not None:
+            await handler()
 
     # ------------------ PDA ---------------------
-    async def perceive(self):
+    def perceive(self):
         return {
             "map": self._last_map,
-            "inventory": dict(self._material_inventory),
-            "bom": dict(self._bom) if self._bom else None,
+            "inventory": self._material_inventory_view,
+            "bom": self._bom,
             "template": self._template_name,
             "build_progress": self._build_progress,
         }
@@ -202,7 +466,7 @@ class BuilderBot(BaseAgent):
         if p["bom"] is None:
             return {"action": "compute_bom"}
 
-        #if not self._materials_ready(p["bom"], p["inventory"]):
+        #if not self._materials_ready(p["inventory"]):
             self.set_state(AgentState.WAITING, "Need materials")
             return {"action": "wait_for_materials"}
 
@@ -248,39 +512,31 @@ class BuilderBot(BaseAgent):
     # ------------- BOM / BUILD PLAN ---------------
     async def _compute_and_send_bom(self):
         tpl = TEMPLATES[self._template_name]
-        self._bom = dict(tpl["materials"])
+        # Todo precalculado al registrar la plantilla: solo se enlaza
+        self._bom = tpl["materials"]  # proxy de solo lectura, sin copia
+        self._bom_items = tpl["bom_items"]
 
-        msg = self.build_message(
-            "materials.requirements.v1",
-            "MinerBot",
+        msg = self.fill_message(
+            self._bom_msg,
             payload=self._bom,
-            context={"template": self._template_name}
+            context=self._template_ctx
         )
         await self.bus.publish(msg)
 
         logger.info("[BUILDER] Published BOM: %s", self._bom)
 
-    def _materials_ready(self, bom, inv):
-        return all(inv.get(k, 0) >= v for k, v in bom.items())
+    def _materials_ready(self, inv):
+        """Comprueba el inventario contra los pares (material, cantidad) precalculados del BOM."""
+        get = inv.get
+        return all(get(m, 0) >= q for m, q in self._bom_items)
 
     async def _make_build_plan(self):
         tpl = TEMPLATES[self._template_name]
-        blocks = tpl["blocks"]
-
-        # Plan: lista de capas y cada capa lista de bloques reales
-        max_y = tpl["height"]
-        plan = [[] for _ in range(max_y)]
-
-        for x, y, z, block in blocks:
-            if block != "minecraft:air":
-                plan[y].append({"x": x, "y": y, "z": z, "material": block})
+        self._block_ids = tpl["block_ids"]
+        self._block_data = tpl["block_data"]
+        self._build_plan = tpl["plan"]
 
-        self._build_plan = [
-            {"y": y, "blocks": layer}
-            for y, layer in enumerate(plan)
-        ]
-
-        logger.info(f"[BUILDER] Build plan ready ({len(self._build_plan)} layers)")
+        logger.info("[BUILDER] Build plan ready (%s layers)", len(self._build_plan))
 
     async def _build_next_layer(self):
         if not self._build_plan or self._build_progress >= len(self._build_plan):
@@ -288,43 +544,63 @@ class BuilderBot(BaseAgent):
 
         layer = self._build_plan[self._build_progress]
 
-        # Obtener coordenadas base del mapa de forma segura
-        if not self._last_map:
+        if self._build_origin is None:
             logger.warning("[BUILDER] No map available, cannot build layer")
             return
 
-        rect = self._last_map.get("best_rectangle")
-        if not rect:
-            logger.warning("[BUILDER] Invalid map rectangle")
-            return
+        base_x, base_y, base_z = self._build_origin
 
-        # Algunos mapas no tienen x/z, usar fallback 0
-        base_x = rect.get("x", rect.get("x1", 0))
-        base_z = rect.get("z", rect.get("z1", 0))
-        base_y = rect.get("y", 0)  # altura base, si el mapa no da altura se asume 0
-
-        for block_info in layer["blocks"]:
-            bx, by, bz, block_name = block_info["x"], block_info["y"], block_info["z"], block_info["material"]
-
-            block = self.get_block_from_name(block_name)
-
-            try:
-                mc.setBlock(base_x + bx, base_y + by, base_z + bz, block.id, block.data)
-            except Exception as e:
-                logger.warning(f"[BUILDER] Failed to place block {block_name} at {(bx, by, bz)}: {e}")
+        # Un único setBlock/setBlocks por rectángulo precalculado en el plan
+        by = layer.y
+        y = base_y + by
+        block_ids, block_data = self._block_ids, self._block_data
+        last_yield = self._last_yield
+        # Los ids ya se validaron al cargar la plantilla: el único fallo
+        # posible es de la conexión, así que se captura una vez por capa
+        try:
+            for i, (x1, z1, x2, z2, mat_id) in enumerate(layer.segments, 1):
+                block_id = block_ids[mat_id]
+                data = block_data[mat_id]
+                if x1 == x2 and z1 == z2:
+                    mc.setBlock(base_x + x1, y, base_z + z1, block_id, data)
+                else:
+                    mc.setBlocks(base_x + x1, y, base_z + z1,
+                                 base_x + x2, y, base_z + z2, block_id, data)
+
+                # En capas grandes, ceder solo cuando se agota el presupuesto;
+                # el reloj se consulta cada 32 segmentos, no en cada uno
+                if not i & 0x1F:
+                    now = time.monotonic()
+                    if now - last_yield > self.BUILD_INTERVAL:
+                        await asyncio.sleep(0)
+                        last_yield = now
+        except Exception as e:
+            logger.warning("[BUILDER] Failed to place layer %s: %s", by, e)
 
-            await asyncio.sleep(self.BUILD_INTERVAL)
+        # Al terminar la capa solo se cede si el presupuesto se ha agotado:
+        # varias capas pequeñas seguidas comparten un mismo yield
+        now = time.monotonic()
+        if now - last_yield > self.BUILD_INTERVAL:
+            await asyncio.sleep(0)
+            last_yield = now
+        self._last_yield = last_yield
 
         self._build_progress += 1
-        logger.info(f"[BUILDER] Layer {self._build_progress}/{len(self._build_plan)} built")
+        logger.info("[BUILDER] Layer %s/%s built", self._build_progress, len(self._build_plan))
 
 
     async def _publish_build_status(self, status, final=False):
-        msg = self.build_message(
-            "build.v1",
-            "*",
+        context = self._template_ctx
+        if final:
+            # El final lleva el rectángulo construido, para que el explorador
+            # pueda darlo por ocupado
+            rect = self._last_map.get("best_rectangle") if self._last_map else None
+            if rect:
+                context = {**context, "best_rectangle": rect}
+        msg = self.fill_message(
+            self._status_msg,
             payload={"status": status, "progress": self._build_progress},
-            context={"template": self._template_name}
+            context=context
         )
         await self.bus.publish(msg)
 
@@ -335,19 +611,26 @@ class BuilderBot(BaseAgent):
         self._build_progress = 0
         self._build_plan = None
         self._bom = None
-        self._material_inventory = {}
+        self._bom_items = ()
+        self._material_inventory.clear()
+
+    def _save_checkpoint_sync(self):
+        logger.info(
+            "[CHECKPOINT] BuilderBot saved: template=%s progress=%s",
+            self._template_name, self._build_progress,
+        )
 
     # ------------- Funciones Auxiliares ---------------
-    def list(self):
+    async def list(self):
         """Print available templates and current selection via logger only."""
 
         logger.info("\n================= BUILDER TEMPLATE LIST =================")
 
-        logger.info(f"Selected template: {self._template_name}")
+        logger.info("Selected template: %s", self._template_name)
 
         for name, tpl in TEMPLATES.items():
-            logger.info(f"\n-> {name}")
-            logger.info(f"   Size: {tpl['width']}×{tpl['height']}×{tpl['depth']}")
+            logger.info("\n-> %s", name)
+            logger.info("   Size: %s×%s×%s", tpl["width"], tpl["height"], tpl["depth"])
 
         logger.info("=========================================================")
 
@@ -361,12 +644,7 @@ class BuilderBot(BaseAgent):
         Devuelve el Block correspondiente a partir del nombre,
         ignorando las propiedades de bloques entre corchetes.
         """
-        base_name = name.split("[")[0]  # elimina propiedades tipo [east=true,...]
-        block = BLOCK_MAP.get(base_name)
-        if block is None:
-            logger.warning(f"[BUILDER] Unknown material {name}, skipping")
-            return AIR  # fallback
-        return block
+        return Block(*_resolve_block_cached(name))
 
     
     async def idle(self):
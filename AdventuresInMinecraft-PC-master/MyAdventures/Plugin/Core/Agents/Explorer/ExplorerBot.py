@@ -1,10 +1,17 @@
 # agents/explorer/explorer_bot.py
 import asyncio
-import time
+import threading
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import compress, groupby, product
+from operator import not_
 from typing import Dict, Any, Optional, Tuple
 import sys
 import os
 
+from mcpi.connection import Connection, RequestError
+
 from ..Strategies.explorer_strategies import search_line, search_spiral, search_random
 from ..BaseAgent import BaseAgent, AgentState
 from ...Logger.logging_config import get_logger
@@ -20,41 +27,389 @@ class TerrainAPI:
     """
     Wrapper around mcpi.getHeight(x,z) and setBlock.
     """
+    # Máximo de columnas en la caché de alturas (LRU)
+    MAX_CACHED_HEIGHTS = 1 << 16
+
     def __init__(self, mc=None):
         self.mc = mc
+        # Hilo persistente para las lecturas: la conexión MCPI no admite
+        # peticiones concurrentes, así que un único worker las serializa
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Caché LRU de alturas por columna (x, z): los escaneos que se solapan
+        # no vuelven a preguntar al servidor. Vive solo en este proceso;
+        # set_block y forget_rect invalidan las columnas que cambian.
+        # El lock la protege entre el hilo del terreno y el loop
+        self._heights: "OrderedDict[Tuple[int, int], int]" = OrderedDict()
+        self._heights_lock = threading.Lock()
 
     def get_height(self, x: int, z: int) -> int:
-        return self.mc.getHeight(x, z)
+        key = (x, z)
+        with self._heights_lock:
+            h = self._heights.get(key)
+            if h is not None:
+                self._heights.move_to_end(key)
+                return h
+        h = self.mc.getHeight(x, z)
+        with self._heights_lock:
+            self._heights[key] = h
+            self._evict_heights()
+        return h
+
+    def get_heights(self, xs, zs) -> array:
+        """
+        Alturas de varias columnas de una vez, como array paralelo a xs/zs.
+        Solo se piden al servidor las columnas que no están en caché.
+        """
+        cache = self._heights
+        keys = list(zip(xs, zs))
+        # Los aciertos se copian aquí: forget_rect puede vaciar columnas desde
+        # el loop mientras este hilo lee del servidor
+        with self._heights_lock:
+            values = {key: cache[key] for key in keys if key in cache}
+        missing = [key for key in keys if key not in values]
+        if missing:
+            mxs, mzs = zip(*missing)
+            fetched = self._fetch_heights(mxs, mzs)
+            values.update(zip(missing, fetched))
+
+        with self._heights_lock:
+            if missing:
+                cache.update(zip(missing, fetched))
+            # Los aciertos que sigan en caché pasan al final (más recientes)
+            touch = cache.move_to_end
+            for key in keys:
+                if key in cache:
+                    touch(key)
+            self._evict_heights()
+        return array("h", map(values.__getitem__, keys))
+
+    def _evict_heights(self):
+        """Expulsa las columnas menos usadas por encima del máximo (con lock)."""
+        cache = self._heights
+        while len(cache) > self.MAX_CACHED_HEIGHTS:
+            cache.popitem(last=False)
+
+    def _fetch_heights(self, xs, zs) -> array:
+        """
+        Lee las alturas del servidor. Con una conexión MCPI real las
+        peticiones se envían todas juntas y las respuestas (una línea cada
+        una, en orden) se leen después: un único viaje de ida y vuelta por
+        lote en lugar de uno por columna.
+        """
+        conn = getattr(self.mc, "conn", None)
+        if not isinstance(conn, Connection):
+            return array("h", map(self.mc.getHeight, xs, zs))
+
+        request = b"".join(b"world.getHeight(%d,%d)\n" % (x, z) for x, z in zip(xs, zs))
+        conn.drain()
+        conn.lastSent = request
+        conn.socket.sendall(request)
+
+        # Un único lector para todo el lote: cada makefile tiene su propio buffer
+        with conn.socket.makefile("r") as reader:
+            replies = [reader.readline() for _ in range(len(xs))]
+        # int() acepta el salto de línea final: cada respuesta se convierte
+        # directamente al array int16, sin rstrip ni buscar "Fail" antes
+        try:
+            return array("h", map(int, replies))
+        except ValueError:
+            raise RequestError("world.getHeight batch failed") from None
+
+    def submit_heights(self, xs, zs) -> "asyncio.Future[array]":
+        """
+        Encola get_heights en el worker del terreno en el acto (sin esperar a
+        que el loop ejecute una corrutina) y devuelve el future.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="terrain")
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, self.get_heights, xs, zs)
 
     def set_block(self, x: int, y: int, z: int, block_id: int):
         self.mc.setBlock(x, y, z, block_id)
+        with self._heights_lock:
+            self._heights.pop((x, z), None)
+
+    def forget_rect(self, x1: int, z1: int, x2: int, z2: int):
+        """
+        Olvida las alturas del rectángulo [x1..x2] x [z1..z2], p. ej. cuando
+        otro agente ha construido encima con su propia conexión.
+        """
+        xa, xb = min(x1, x2), max(x1, x2)
+        za, zb = min(z1, z2), max(z1, z2)
+        with self._heights_lock:
+            cache = self._heights
+            if not cache:
+                return
+            # Se recorre lo más pequeño: el rectángulo o la caché
+            if (xb - xa + 1) * (zb - za + 1) <= len(cache):
+                for key in product(range(xa, xb + 1), range(za, zb + 1)):
+                    cache.pop(key, None)
+            else:
+                for key in [k for k in cache if xa <= k[0] <= xb and za <= k[1] <= zb]:
+                    del cache[key]
+
+# ============================================================
+# Flat-area kernels (funciones puras: sin self ni atributos)
+# ============================================================
+def _largest_rectangle_hist(heights, min_side=1):
+    """
+    Largest rectangle in histogram algorithm. Solo cuenta rectángulos con
+    alto y ancho >= min_side (donde cabe un cubo de ese lado).
+    """
+    stack = []
+    push, pop = stack.append, stack.pop  # métodos ligados fuera del bucle
+    max_area = 0
+    left = right = 0
+
+    heights.append(0)
+    for i, h in enumerate(heights):
+        start = i
+        while stack and stack[-1][1] > h:
+            index, height = pop()
+            area = height * (i - index)
+            if area > max_area and height >= min_side and i - index >= min_side:
+                max_area = area
+                left = index
+                right = i - 1
+            start = index
+        push((start, h))
+    heights.pop()
+
+    return max_area, left, right
+
+
+def _uniform_rectangles_kernel(grid, rows, cols, min_side, hist, st_start, st_h, best):
+    """
+    Mayor rectángulo de cada nivel en una sola pasada sobre el grid de ids
+    de nivel (fila-mayor, -1 = columna sin escanear). hist[x] cuenta cuántas
+    filas seguidas, acabando en la actual, tiene la columna x el mismo nivel;
+    cada tramo de la fila con un mismo nivel es un histograma independiente.
+    Solo cuentan los rectángulos con ambos lados >= min_side.
+    best guarda 5 enteros por nivel: (area, z1, x1, z2, x2).
+    Bucles explícitos y buffers preasignados para poder compilarlo con Numba.
+    """
+    for z in range(rows):
+        base = z * cols
+        for x in range(cols):
+            v = grid[base + x]
+            if v < 0:
+                hist[x] = 0
+            elif z > 0 and grid[base - cols + x] == v:
+                hist[x] += 1
+            else:
+                hist[x] = 1
+
+        x = 0
+        while x < cols:
+            v = grid[base + x]
+            end = x + 1
+            while end < cols and grid[base + end] == v:
+                end += 1
+
+            if v >= 0 and end - x >= min_side:
+                top = 0
+                max_area = 0
+                left = right = 0
+                for i in range(x, end + 1):
+                    h = hist[i] if i < end else 0
+                    start = i
+                    while top > 0 and st_h[top - 1] > h:
+                        top -= 1
+                        index = st_start[top]
+                        area = st_h[top] * (i - index)
+                        if area > max_area and st_h[top] >= min_side and i - index >= min_side:
+                            max_area = area
+                            left = index
+                            right = i - 1
+                        start = index
+                    st_start[top] = start
+                    st_h[top] = h
+                    top += 1
+
+                k = 5 * v
+                if max_area > best[k]:
+                    height = max_area // (right - left + 1)
+                    best[k] = max_area
+                    best[k + 1] = z - height + 1
+                    best[k + 2] = left
+                    best[k + 3] = z
+                    best[k + 4] = right
+            x = end
+
+    return best
+
+
+# Numba es opcional: si está instalado, el kernel se compila a código nativo
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:
+    np = None
+    _uniform_rectangles_jit = None
+else:
+    _uniform_rectangles_jit = njit(cache=True, boundscheck=False)(_uniform_rectangles_kernel)
+
+
+def _uniform_rectangles(grid, rows: int, cols: int, n_levels: int, min_side: int = 1):
+    """
+    Mayor rectángulo de cada nivel del grid de ids (ver _uniform_rectangles_kernel).
+    Devuelve la lista plana (area, z1, x1, z2, x2) * n_levels.
+    """
+    if _uniform_rectangles_jit is not None:
+        return _uniform_rectangles_jit(
+            np.frombuffer(grid, dtype=np.int16), rows, cols, min_side,
+            np.zeros(cols, dtype=np.int64),
+            np.empty(cols + 1, dtype=np.int64),
+            np.empty(cols + 1, dtype=np.int64),
+            np.zeros(5 * n_levels, dtype=np.int64),
+        ).tolist()
+
+    # Mismo recorrido en Python: el histograma de cada fila con una
+    # comprensión y los tramos de igual nivel con groupby
+    best = [0] * (5 * n_levels)
+    hist = [0] * cols
+    prev = None
+    rect_hist = _largest_rectangle_hist  # global -> local en el bucle caliente
+    for z in range(rows):
+        row = grid[z * cols:(z + 1) * cols]
+        if prev is None:
+            hist = [0 if v < 0 else 1 for v in row]
+        else:
+            hist = [0 if v < 0 else (h + 1 if v == p else 1) for h, v, p in zip(hist, row, prev)]
+        prev = row
+
+        x = 0
+        for v, run in groupby(row):
+            end = x + sum(1 for _ in run)
+            if v >= 0 and end - x >= min_side:
+                if end - x == 1:
+                    # Tramo de una sola columna (lo habitual en terreno
+                    # irregular): el rectángulo es la propia barra, sin pila
+                    area, left, right = hist[x], 0, 0
+                else:
+                    area, left, right = rect_hist(hist[x:end], min_side)
+                k = 5 * v
+                if area > best[k]:
+                    height = area // (right - left + 1)
+                    best[k:k + 5] = (area, z - height + 1, x + left, z, x + right)
+            x = end
+
+    return best
+
+
+# ============================================================
+# Occupancy bitmap
+# ============================================================
+class OccupancyMap:
+    """
+    Columnas (x, z) ya asignadas a una construcción. Bitmap disperso por
+    tiles de 16x16 (un chunk): 16 filas de 16 bits por tile (32 bytes), un
+    bit por columna y sin tupla por celda.
+    """
+    __slots__ = ("_tiles",)
+
+    def __init__(self):
+        self._tiles: Dict[Tuple[int, int], array] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._tiles)
+
+    def __contains__(self, xz: Tuple[int, int]) -> bool:
+        x, z = xz
+        tile = self._tiles.get((x >> 4, z >> 4))
+        return tile is not None and (tile[z & 15] >> (x & 15)) & 1 == 1
+
+    def mark_rect(self, x1: int, z1: int, x2: int, z2: int):
+        """Marca el rectángulo [x1..x2] x [z1..z2] (ambos inclusive)."""
+        for tz in range(z1 >> 4, (z2 >> 4) + 1):
+            for tx in range(x1 >> 4, (x2 >> 4) + 1):
+                tile = self._tiles.get((tx, tz))
+                if tile is None:
+                    tile = self._tiles[tx, tz] = array("H", bytes(32))
+                # Trozo del rectángulo que cae en este tile: una máscara de
+                # bits por fila, en coords locales
+                lx1 = max(x1, tx << 4) & 15
+                lx2 = min(x2, (tx << 4) + 15) & 15
+                mask = ((1 << (lx2 - lx1 + 1)) - 1) << lx1
+                for z in range(max(z1, tz << 4) & 15, (min(z2, (tz << 4) + 15) & 15) + 1):
+                    tile[z] |= mask
+
+    def mask(self, xs: array, zs: array) -> bytearray:
+        """Máscara paralela a (xs, zs): 1 si la columna está ocupada."""
+        get = self._tiles.get
+        occ = bytearray(len(xs))
+        # Las coordenadas de un escaneo llegan por tramos contiguos: el tile
+        # solo se busca de nuevo cuando cambia
+        last_tx = last_tz = None
+        tile = None
+        for i, (x, z) in enumerate(zip(xs, zs)):
+            tx, tz = x >> 4, z >> 4
+            if tx != last_tx or tz != last_tz:
+                tile = get((tx, tz))
+                last_tx, last_tz = tx, tz
+            if tile is not None and (tile[z & 15] >> (x & 15)) & 1:
+                occ[i] = 1
+        return occ
+
+    def clear(self):
+        self._tiles.clear()
+
 
 # ============================================================
 # ExplorerBot Implementation
 # ============================================================
 class ExplorerBot(BaseAgent):
-    SCAN_DELAY = 0.01
+    # Las estrategias ceden el loop una vez cada SCAN_YIELD_EVERY pasos
+    # (potencia de 2); el resto de pasos no crea ninguna corrutina
+    SCAN_YIELD_EVERY = 256
+    # Columnas por petición de alturas (un viaje de ida y vuelta por lote).
+    # Un escaneo de radio 30 (61x61) cabe en un solo lote; los escaneos más
+    # grandes se trocean para poder pausar/parar entre lotes
+    SCAN_BATCH = 4096
+    # Escaneos encadenados (peticiones en cola) publican como mucho un
+    # map.v1 por intervalo, con el último rectángulo válido entre ellos
+    MAP_PUBLISH_INTERVAL = 1.0  # seconds
 
     def __init__(self, agent_id="ExplorerBot", bus=None):
         super().__init__(agent_id, bus)
         self.center: Tuple[int, int] = (0, 0)
         self.range: int = 30
-        self._last_publish: float = 0.0
+        # Lado del cubo a construir: solo valen zonas planas donde quepa
+        self.cube_size: int = 1
         self._queued_request: Optional[Tuple[int, int, int, int]] = None
         self.terrain = TerrainAPI()
-        self.occupied = set()
+        # Zonas donde el builder ya ha terminado: no se vuelven a proponer
+        self.occupied = OccupancyMap()
+        self._scan_steps = 0
         self.bus = bus
 
         # Estrategia por defecto
         self.search_strategy = search_random
 
-        self.bus.subscribe("command.explorer.start.v1", self._on_start_cmd)
-        self.bus.subscribe("command.explorer.set.v1", self._on_update_cmd)
-        self.bus.subscribe("command.explorer.pause.v1", self._on_control)
-        self.bus.subscribe("command.explorer.resume.v1", self._on_control)
-        self.bus.subscribe("command.explorer.stop.v1", self._on_control)
-        self.bus.subscribe("command.explorer.status.v1", self._on_control)
-        self.bus.subscribe("*", self._on_generic)
+        # Esqueleto de map.v1: solo cambian payload y context en cada publicación
+        self._map_msg = self.message_scaffold("map.v1", "BuilderBot")
+        # Último resultado aún no publicado (ver MAP_PUBLISH_INTERVAL), con el
+        # centro y rango del escaneo que lo produjo: (rect, center, range)
+        self._pending_map: Optional[Tuple[Optional[Dict[str, Any]], Tuple[int, int], int]] = None
+        self._last_map_publish = 0.0
+
+        # Tabla de despacho: tipo de comando completo -> handler. El bus ya
+        # entrega por tipo exacto, así que basta un lookup sin partir el tipo
+        self._cmd_table = {
+            "command.explorer.pause.v1": self.pause,
+            "command.explorer.resume.v1": self.resume,
+            "command.explorer.stop.v1": self.stop,
+            "command.explorer.status.v1": self.status,
+        }
+
+        # El bus solo entrega los mensajes dirigidos a este agente o a "*"
+        self.bus.subscribe("command.explorer.start.v1", self._on_start_cmd, target=self.agent_id)
+        self.bus.subscribe("command.explorer.set.v1", self._on_update_cmd, target=self.agent_id)
+        for cmd_type in self._cmd_table:
+            self.bus.subscribe(cmd_type, self._on_control, target=self.agent_id)
+        # Las zonas solo se dan por ocupadas cuando el builder termina en ellas
+        self.bus.subscribe("build.v1", self._on_build_status, target=self.agent_id)
 
     def set_strategy(self, strategy_name: str):
         strategies = {
@@ -65,8 +420,10 @@ class ExplorerBot(BaseAgent):
         if strategy_name in strategies:
             self.search_strategy = strategies[strategy_name]
 
-    async def _yield_scan(self):
-        await asyncio.sleep(self.SCAN_DELAY)
+    def _scan_tick(self) -> bool:
+        """Cuenta un paso de escaneo; True cuando toca ceder el loop."""
+        self._scan_steps += 1
+        return not self._scan_steps & (self.SCAN_YIELD_EVERY - 1)
 
 
     # ---------------------------------------------------------
@@ -74,36 +431,47 @@ class ExplorerBot(BaseAgent):
     # ---------------------------------------------------------
     async def _on_start_cmd(self, msg: Dict[str, Any]):
         """Handle `explorer start x=... z=... range=...`"""
-        if msg.get("target") not in (self.agent_id, "*"):
-            return
-
-        payload = msg.get("payload", {})
+        payload = msg.get("payload") or {}
         x = int(payload.get("x", self.center[0]))
         z = int(payload.get("z", self.center[1]))
         r = int(payload.get("range", self.range))
+        c = max(1, int(payload.get("cube", self.cube_size)))
 
-        logger.info("[EXPLORER] Start request: x=%s z=%s range=%s cube=%s", x, z, r)
+        logger.info("[EXPLORER] Start request: x=%s z=%s range=%s cube=%s", x, z, r, c)
 
         # If the bot is running, queue new scan
         if self.state == AgentState.RUNNING:
             logger.info("[EXPLORER] Queuing new request until current scan finishes")
-            self._queued_request = (x, z, r)
+            self._queued_request = (x, z, r, c)
         else:
             self.center = (x, z)
             self.range = r
+            self.cube_size = c
             await self.start()
 
-    async def _on_update_cmd(self, msg: Dict[str, Any]):
-        """Handle `explorer set` command with optional parameters in payload."""
-        if msg.get("target") not in (self.agent_id, "*"):
+    async def _on_build_status(self, msg: Dict[str, Any]):
+        """Marca como ocupado el rectángulo de una construcción terminada."""
+        payload = msg.get("payload") or {}
+        if payload.get("status") != "COMPLETED":
             return
+        rect = (msg.get("context") or {}).get("best_rectangle")
+        if rect:
+            self.occupied.mark_rect(rect["x1"], rect["z1"], rect["x2"], rect["z2"])
+            # El builder escribe con su propia conexión: las alturas cacheadas
+            # de la zona ya no valen
+            self.terrain.forget_rect(rect["x1"], rect["z1"], rect["x2"], rect["z2"])
 
-        payload = msg.get("payload", {})
+    async def _on_update_cmd(self, msg: Dict[str, Any]):
+        """Handle `explorer set` command with optional parameters in payload."""
+        payload = msg.get("payload") or {}
 
         # Actualizar rango si viene en payload
         if "range" in payload:
             self.range = int(payload["range"])
 
+        if "cube" in payload:
+            self.cube_size = max(1, int(payload["cube"]))
+
         # Actualizar estrategia si viene en payload
         if "strategy" in payload:
             self.set_strategy(payload["strategy"])
@@ -114,22 +482,9 @@ class ExplorerBot(BaseAgent):
 
     async def _on_control(self, msg: Dict[str, Any]):
         """pause/resume/stop commands"""
-        if msg.get("target") not in (self.agent_id, "*"):
-            return
-
-        cmdtype = msg.get("type", "")
-        if cmdtype.endswith(".pause.v1"):
-            await self.pause()
-        elif cmdtype.endswith(".resume.v1"):
-            await self.resume()
-        elif cmdtype.endswith(".stop.v1"):
-            await self.stop()
-        elif cmdtype.endswith(".status.v1"):
-            await self.status()
-
-    async def _on_generic(self, msg: Dict[str, Any]):
-        # Debug tap for other messages
-        return
+        handler = self._cmd_table.get(msg.get("type"))
+        if handler is not None:
+            await handler()
 
     # ---------------------------------------------------------
     # PDA Methods
@@ -138,64 +493,98 @@ class ExplorerBot(BaseAgent):
         x0, z0 = self.center
         r = self.range
 
-        # coords según la estrategia seleccionada
-        candidates = await self.search_strategy(self, x0, z0, r)
+        # coords según la estrategia seleccionada, ya como arrays paralelos
+        # (SoA) y sin repetidas. int32 basta para el mundo (±30M) y las
+        # alturas caben en int16. Las deterministas (línea, espiral) memorizan
+        # sus desplazamientos por rango y solo los trasladan al centro
+        xs, zs = await self.search_strategy(self, x0, z0, r)
+
+        # Las columnas ocupadas siguen en el escaneo (y en los ejes de decide,
+        # para que no se junten las zonas a ambos lados de una construcción),
+        # pero su altura no se pide: decide las trata como sin escanear
+        occ = self.occupied.mask(xs, zs) if self.occupied else None
+
+        # Leer alturas por lotes en el worker del terreno (el loop queda libre
+        # mientras tanto). Los lotes se piden chunk a chunk (tiles de 16x16)
+        # para que el servidor no salte entre chunks, y cada altura se vuelve
+        # a colocar en su posición del escaneo, paralela a xs/zs. El lote
+        # siguiente se encola antes de recolocar el actual, así el worker
+        # sigue leyendo mientras el loop trabaja
+        n = len(xs)
+        tiles = [(x >> 4, z >> 4) for x, z in zip(xs, zs)]
+        fetch = range(n) if occ is None else compress(range(n), map(not_, occ))
+        order = sorted(fetch, key=tiles.__getitem__)
+        heights = array("h", bytes(2 * n))
+        batch = self.SCAN_BATCH
+        batches = [order[i:i + batch] for i in range(0, n, batch)]
+
+        def submit(idx):
+            return self.terrain.submit_heights(
+                array("i", map(xs.__getitem__, idx)), array("i", map(zs.__getitem__, idx))
+            )
+
+        pending = submit(batches[0]) if batches else None
+        for k, idx in enumerate(batches):
+            bhs = await pending
+            # Un pause llega entre lotes: no se encola el siguiente hasta el
+            # resume (stop() ya cancela la tarea en cualquiera de estos await)
+            if self._state == AgentState.PAUSED:
+                await self._resume_event.wait()
+            if k + 1 < len(batches):
+                pending = submit(batches[k + 1])
+            for j, h in zip(idx, bhs):
+                heights[j] = h
 
-        # construir height_map
-        height_map = {}
-        for x, z in candidates:
-            h = self.terrain.get_height(x, z)
-            height_map[(x, z)] = h
-            logger.info(f"[EXPLORER] Perciviendo coordenadas ({x},{z}) con altura {h}")
-            await asyncio.sleep(self.SCAN_DELAY)
+        logger.debug("[EXPLORER] Scanned %s columns around (%s,%s)", len(xs), x0, z0)
 
-        return {"height_map": height_map}
+        return {"xs": xs, "zs": zs, "heights": heights, "occupied": occ}
 
     async def decide(self, percept: Dict[str, Any]) -> Dict[str, Any]:
         """
         Detecta el rectángulo más grande para cualquier altura encontrada.
         Devuelve: { x1, z1, x2, z2, height, width, area }
         """
-        height_map = percept["height_map"]
-
-        # Agrupar coordenadas por altura
-        levels = {}
-        for (x, z), h in height_map.items():
-            levels.setdefault(h, []).append((x, z))
+        xs, zs, heights = percept["xs"], percept["zs"], percept["heights"]
+        occ = percept.get("occupied")
+
+        # Niveles = alturas distintas en orden de aparición; su posición es el
+        # id de nivel, que desempata a igual área. Sin agrupar coordenadas
+        free_heights = heights if occ is None else compress(heights, map(not_, occ))
+        levels = list(dict.fromkeys(free_heights))
+        level_id = dict(zip(levels, range(len(levels))))
+        if occ is None:
+            lids = map(level_id.__getitem__, heights)
+        else:
+            # Columna ocupada = -1, igual que una sin escanear
+            lids = (-1 if o else level_id[h] for h, o in zip(heights, occ))
+
+        # Un único grid comprimido para todo el escaneo: los ejes y sus índices
+        # se calculan una vez y todos los niveles comparten la misma geometría
+        # (dos celdas solo son contiguas si no hay otra escaneada entre ellas)
+        x_axis = sorted(set(xs))
+        z_axis = sorted(set(zs))
+        x_index = dict(zip(x_axis, range(len(x_axis))))
+        z_index = dict(zip(z_axis, range(len(z_axis))))
+
+        # Grid de ids de nivel (-1 = sin escanear u ocupada), relleno en un
+        # solo recorrido de los arrays paralelos con los índices traducidos por map
+        cols, rows = len(x_axis), len(z_axis)
+        grid = array("h", [-1]) * (rows * cols)
+        for zi, xi, lid in zip(
+            map(z_index.__getitem__, zs), map(x_index.__getitem__, xs), lids
+        ):
+            grid[zi * cols + xi] = lid
+
+        # Una sola pasada por filas para todos los niveles a la vez; solo
+        # cuentan las zonas donde cabe un cubo de lado cube_size
+        best = _uniform_rectangles(grid, rows, cols, len(levels), self.cube_size)
 
         best_rect = None  # (area, x1, z1, x2, z2, height_level)
-
-        # Procesar altura por altura
-        for h, coords in levels.items():
-            # Construir grid local
-            xs = sorted(set([c[0] for c in coords]))
-            zs = sorted(set([c[1] for c in coords]))
-
-            x_index = {x: i for i, x in enumerate(xs)}
-            z_index = {z: i for i, z in enumerate(zs)}
-
-            grid = [[0] * len(zs) for _ in range(len(xs))]
-
-            for (x, z) in coords:
-                grid[x_index[x]][z_index[z]] = 1
-
-            # Convertir en "matriz por filas"
-            matrix = list(zip(*grid))  # filas = z, columnas = x
-
-            # Buscar mayor rectángulo
-            rect = self._largest_rectangle_in_matrix(matrix)
-
-            if rect is None:
-                continue
-
-            area, (z1_i, x1_i), (z2_i, x2_i) = rect
-
-            # Convertir indices a coords reales
-            x1, x2 = xs[x1_i], xs[x2_i]
-            z1, z2 = zs[z1_i], zs[z2_i]
-
-            if best_rect is None or area > best_rect[0]:
-                best_rect = (area, x1, z1, x2, z2, h)
+        for lid, h in enumerate(levels):
+            area, z1_i, x1_i, z2_i, x2_i = best[5 * lid:5 * lid + 5]
+            if area and (best_rect is None or area > best_rect[0]):
+                # Convertir indices a coords reales
+                best_rect = (area, x_axis[x1_i], z_axis[z1_i], x_axis[x2_i], z_axis[z2_i], h)
 
         if best_rect:
             area, x1, z1, x2, z2, h = best_rect
@@ -236,16 +625,23 @@ class ExplorerBot(BaseAgent):
                 f"area={rect['area']} bloques, altura={rect['y']}"
             )
 
-        # Publicar resultados
-        await self._publish_map(rect)
+        # Guardar el resultado con su escaneo; se publica ya salvo que venga
+        # otro escaneo en cola dentro del intervalo. Se queda el último
+        # rectángulo válido: un escaneo sin resultado no borra uno anterior
+        pending = self._pending_map
+        if rect is not None or pending is None or pending[0] is None:
+            self._pending_map = (rect, self.center, self.range)
+        if not self._queued_request or self._tick_time - self._last_map_publish >= self.MAP_PUBLISH_INTERVAL:
+            await self._flush_map()
 
         # Manejar siguiente petición si existe
         if self._queued_request:
-            x, z, r = self._queued_request
+            x, z, r, c = self._queued_request
             self._queued_request = None
 
             self.center = (x, z)
             self.range = r
+            self.cube_size = c
 
             logger.info(
                 "[EXPLORER] Switching to queued request: "
@@ -260,76 +656,30 @@ class ExplorerBot(BaseAgent):
     # ---------------------------------------------------------
     # Helpers
     # ---------------------------------------------------------
-    def _largest_rectangle_hist(self, heights):
-        """Largest rectangle in histogram algorithm."""
-        stack = []
-        max_area = 0
-        left = right = 0
-
-        heights.append(0)
-        for i, h in enumerate(heights):
-            start = i
-            while stack and stack[-1][1] > h:
-                index, height = stack.pop()
-                area = height * (i - index)
-                if area > max_area:
-                    max_area = area
-                    left = index
-                    right = i - 1
-                start = index
-            stack.append((start, h))
-        heights.pop()
-
-        return max_area, left, right
-
-
-    def _largest_rectangle_in_matrix(self, matrix):
-        """
-        Encuentra el mayor rectángulo de 1s en una matriz binaria.
-        matrix[fila=z][columna=x]
-        """
-        if not matrix:
-            return None
-
-        rows = len(matrix)
-        cols = len(matrix[0])
-        heights = [0] * cols
-
-        best = None  # (area, (z1,x1), (z2,x2))
-
-        for z in range(rows):
-            for x in range(cols):
-                heights[x] = heights[x] + 1 if matrix[z][x] == 1 else 0
+    async def _flush_map(self):
+        """Publica el último resultado pendiente."""
+        rect, center, scan_range = self._pending_map
+        self._pending_map = None
+        self._last_map_publish = self._tick_time
 
-            area, x1, x2 = self._largest_rectangle_hist(heights)
-            if area > 0:
-                height = area // (x2 - x1 + 1)
-                z2 = z
-                z1 = z - height + 1
+        await self._publish_map(rect, center, scan_range)
 
-                if best is None or area > best[0]:
-                    best = (area, (z1, x1), (z2, x2))
-
-        return best
-
-    async def _publish_map(self, rect: Optional[Dict[str, Any]]):
+    async def _publish_map(self, rect: Optional[Dict[str, Any]],
+                           center: Tuple[int, int], scan_range: int):
         """
         Publica el resultado para BuilderBot en formato limpio.
-        rect = None o un dict con x1,z1,x2,z2,area,width,height,y
+        rect = None o un dict con x1,z1,x2,z2,area,width,height,y; center y
+        scan_range son los del escaneo que lo encontró
         """
-        msg = {
-            "type": "map.v1",
-            "source": self.agent_id,
-            "target": "BuilderBot",
-            "payload": {
-                "best_rectangle": rect,
+        msg = self.fill_message(
+            self._map_msg,
+            {"best_rectangle": rect},
+            context={
+                "center": center,
+                "range": scan_range,
+                "state": self.state.name,
             },
-            "context": {
-                "center": self.center,
-                "range": self.range,
-                "state": self.state.value,
-            },
-        }
+        )
 
         await self.bus.publish(msg)
 
@@ -346,21 +696,25 @@ class ExplorerBot(BaseAgent):
     # Control Overloads
     # ---------------------------------------------------------
     async def stop(self):
+        # No perder el resultado de escaneos agrupados aún sin publicar
+        if self._pending_map is not None:
+            await self._flush_map()
         await super().stop()
 
     async def idle(self):
         await super().idle()
 
-    async def save_checkpoint(self):
+    def _save_checkpoint_sync(self):
         logger.info("[CHECKPOINT] ExplorerBot saved: center=%s range=%s", self.center, self.range)
     
     async def status(self):
         """Imprime el estado actual del bot en el logger"""
         info = {
             "agent_id": self.agent_id,
-            "state": self.state.value,
+            "state": self.state.name,
             "center": self.center,
             "range": self.range,
+            "cube": self.cube_size,
             "strategy": self.search_strategy.__name__,
         }
         logger.info("[EXPLORER STATUS] %s", info)
@@ -1,8 +1,9 @@
 # agents/miner/miner_bot.py
 import asyncio
-import time
-from typing import Dict, Any, Optional, Tuple
+import sys
+from typing import Dict, Any, Optional, Set, Tuple
 from collections import defaultdict
+from collections.abc import Mapping
 
 from ..BaseAgent import BaseAgent, AgentState
 from ...Logger.logging_config import get_logger
@@ -14,41 +15,34 @@ logger = get_logger(__name__)
 # Simple lock manager by sector (x,z)
 # ---------------------------
 class SectorLockManager:
+    # busy sectors in a plain set; one Condition wakes waiters on release
+    # instead of one asyncio.Lock per sector behind a global lock
     def __init__(self):
-        self._locks: Dict[Tuple[int, int], asyncio.Lock] = {}
-        self._global = asyncio.Lock()
+        self._busy: Set[Tuple[int, int]] = set()
+        self._cond = asyncio.Condition()
 
     async def acquire(self, sector: Tuple[int, int], timeout: Optional[float] = None) -> bool:
-        # ensure the lock object exists
-        async with self._global:
-            if sector not in self._locks:
-                self._locks[sector] = asyncio.Lock()
-            lock = self._locks[sector]
-
-        try:
-            if timeout is None:
-                await lock.acquire()
-                return True
-            else:
-                return await asyncio.wait_for(lock.acquire(), timeout=timeout)
-        except asyncio.TimeoutError:
-            return False
+        async with self._cond:
+            if sector in self._busy:
+                try:
+                    await asyncio.wait_for(
+                        self._cond.wait_for(lambda: sector not in self._busy), timeout=timeout
+                    )
+                except asyncio.TimeoutError:
+                    return False
+            self._busy.add(sector)
+            return True
 
     async def release(self, sector: Tuple[int, int]):
-        async with self._global:
-            lock = self._locks.get(sector)
-            if lock and lock.locked():
-                lock.release()
+        async with self._cond:
+            if sector in self._busy:
+                self._busy.discard(sector)
+                self._cond.notify_all()
 
     async def release_all(self):
-        async with self._global:
-            for s, lock in list(self._locks.items()):
-                if lock.locked():
-                    try:
-                        lock.release()
-                    except RuntimeError:
-                        # already released or not owned
-                        pass
+        async with self._cond:
+            self._busy.clear()
+            self._cond.notify_all()
 
 
 # ---------------------------
@@ -142,13 +136,20 @@ class MinerBot(BaseAgent):
         self._locks = SectorLockManager()
         self._last_publish = 0.0
         self._mining = False
+        # fixed inventory.v1 skeleton; only payload/status/context change per publish
+        self._inventory_msg = self.message_scaffold("inventory.v1", "BuilderBot")
+        # command suffix -> handler ("update" is handled apart: it takes the payload)
+        self._cmd_table = {
+            "pause": self.pause,
+            "resume": self.resume,
+            "stop": self.stop,
+        }
         # subscribe to bus messages if provided
         if self.bus:
-            # subscribe to materials.requirements.v1 and command messages
+            # subscribe to materials.requirements.v1 and command messages;
+            # the bus only delivers commands aimed at this agent or at "*"
             self.bus.subscribe('materials.requirements.v1', self._on_materials_request)
-            self.bus.subscribe('command.*.v1', self._on_command_message)
-            # also accept direct control channel wildcard
-            self.bus.subscribe('*', self._on_generic_message)
+            self.bus.subscribe('command.*.v1', self._on_command_message, target=self.agent_id)
 
     # -----------------------
     # Strategy factory
@@ -179,12 +180,13 @@ class MinerBot(BaseAgent):
         """
         try:
             payload = msg.get('payload') or {}
-            if not isinstance(payload, dict):
+            if not isinstance(payload, Mapping):
                 logger.error("Invalid BOM payload: %s", payload)
                 return
             logger.info("Received BOM from %s: %s", msg.get('source'), payload)
             # accept BOM and start fulfillment
-            self._current_bom = dict(payload)
+            # interned keys: they match the inventory keys by identity
+            self._current_bom = {sys.intern(mat): qty for mat, qty in payload.items()}
             # if not running, start agent loop (caller may have started already)
             if self.state != AgentState.RUNNING:
                 # don't await here; let the main loop pick up work
@@ -195,36 +197,30 @@ class MinerBot(BaseAgent):
     async def _on_command_message(self, msg: Dict[str, Any]):
         # Very small generic command handler; expects control messages formatted already.
         try:
-            payload = msg.get('payload', {})
-            cmd = msg.get('type', '')
-            if msg.get('target') not in (self.agent_id, '*'):
-                return
-            if cmd.endswith('.pause.v1') or cmd == 'command.pause.v1':
-                await self.pause()
-            elif cmd.endswith('.resume.v1') or cmd == 'command.resume.v1':
-                await self.resume()
-            elif cmd.endswith('.stop.v1') or cmd == 'command.stop.v1':
-                await self.stop()
-            elif cmd.endswith('.update.v1') or cmd == 'command.update.v1':
+            payload = msg.get('payload') or {}
+            # 'command.miner.pause.v1' / 'command.pause.v1' -> 'pause'
+            parts = msg.get('type', '').rsplit('.', 2)
+            suffix = parts[-2] if len(parts) == 3 else None
+            if suffix == 'update':
                 await self.update(payload or {})
+                return
+            handler = self._cmd_table.get(suffix)
+            if handler is not None:
+                await handler()
         except Exception:
             logger.exception("Error handling command message")
 
-    async def _on_generic_message(self, msg: Dict[str, Any]):
-        # Optional: listen to other messages (e.g., builder broadcasts)
-        return
-
     # -----------------------
     # PDA cycle implementations
     # -----------------------
     async def perceive(self) -> Dict[str, Any]:
         # Minimal perception: return BOM snapshot and strategy
-        await asyncio.sleep(0)  # yield
+        # (no yield here: act() sleeps and the agent loop yields every 64 ticks)
         percept = {
             "bom": dict(self._current_bom) if self._current_bom else None,
             "inventory": dict(self.inventory),
             "strategy": self._strategy_name,
-            "state": self.state.value
+            "state": self.state.name
         }
         return percept
 
@@ -289,7 +285,7 @@ class MinerBot(BaseAgent):
             await asyncio.sleep(0.05)
 
             # simulate material found (toy logic: alternating)
-            found_mat = self._simulate_material_from_target(target)
+            found_mat = sys.intern(self._simulate_material_from_target(target))
             self.inventory[found_mat] = self.inventory.get(found_mat, 0) + 1
 
             # release lock
@@ -316,7 +312,8 @@ class MinerBot(BaseAgent):
     # Publishing inventory
     # -----------------------
     async def _maybe_publish_inventory(self):
-        now = time.time()
+        # monotonic time read once by the agent loop for this tick
+        now = self._tick_time
         if now - self._last_publish >= MinerBot.INVENTORY_PUBLISH_INTERVAL:
             await self._publish_inventory(status="RUNNING", final=False)
             self._last_publish = now
@@ -325,15 +322,12 @@ class MinerBot(BaseAgent):
         if not self.bus:
             logger.debug("No bus configured, skipping inventory publish")
             return
-        msg = {
-            "type": "inventory.v1",
-            "source": self.agent_id,
-            "target": "BuilderBot",
-            "timestamp": None,  # bus may set timestamp
-            "payload": dict(self.inventory),
-            "status": status,
-            "context": {"task_id": "auto", "state": self.state.value}
-        }
+        msg = self.fill_message(
+            self._inventory_msg,
+            dict(self.inventory),
+            status=status,
+            context={"task_id": "auto", "state": self.state.name},
+        )
         await self.bus.publish(msg)
         logger.info("Published inventory (%s): %s", status, self.inventory)
         if final:
@@ -360,7 +354,7 @@ class MinerBot(BaseAgent):
         await self._locks.release_all()
         await super().stop()
 
-    async def save_checkpoint(self):
+    def _save_checkpoint_sync(self):
         # Minimal checkpoint: dump inventory and BOM (could be serialized to a file)
         logger.info("MinerBot checkpoint: inventory=%s bom=%s", dict(self.inventory), self._current_bom)
         # In a complete implementation, persist to disk / DB here
@@ -1,68 +1,140 @@
 # agents/explorer/explorer_strategies.py
+import asyncio
 import random
-from typing import Tuple, List
+from array import array
+from collections import OrderedDict
+from itertools import chain, product, repeat
+from typing import Optional, Tuple
 
-async def search_line(bot, x0: int, z0: int, length: int):
+# Las estrategias devuelven las coordenadas como dos arrays paralelos (xs, zs)
+# de int32, sin una tupla por celda y sin celdas repetidas. Todo lo constante del bucle (grosor,
+# contador de pasos del bot) se calcula una vez antes de entrar; solo se cede
+# el loop cuando el contador lo indica
+
+# Desplazamientos (dxs, dzs) respecto al origen de las estrategias
+# deterministas, por (estrategia, longitud/radio): se generan una vez y en las
+# llamadas siguientes solo se trasladan al centro pedido. LRU pequeña y solo
+# para escaneos de hasta _MEMO_MAX_CELLS celdas (2 MB por entrada como mucho):
+# un radio enorme no queda retenido durante toda la vida del proceso
+_MEMO_SIZE = 4
+_MEMO_MAX_CELLS = 1 << 18
+_offsets_cache: "OrderedDict[Tuple[str, int], Tuple[array, array]]" = OrderedDict()
+
+
+def _cached_offsets(key: Tuple[str, int]) -> Optional[Tuple[array, array]]:
+    offsets = _offsets_cache.get(key)
+    if offsets is not None:
+        _offsets_cache.move_to_end(key)
+    return offsets
+
+
+def _store_offsets(key: Tuple[str, int], offsets: Tuple[array, array]):
+    if len(offsets[0]) > _MEMO_MAX_CELLS:
+        return
+    _offsets_cache[key] = offsets
+    while len(_offsets_cache) > _MEMO_SIZE:
+        _offsets_cache.popitem(last=False)
+
+
+def _translate(offsets: Tuple[array, array], x0: int, z0: int) -> Tuple[array, array]:
+    dxs, dzs = offsets
+    return array("i", map(x0.__add__, dxs)), array("i", map(z0.__add__, dzs))
+
+
+async def search_line(bot, x0: int, z0: int, length: int) -> Tuple[array, array]:
     """Devuelve coordenadas en línea recta considerando el grosor del cubo."""
-    coords: List[Tuple[int, int]] = []
-    x, z = x0, z0
+    offsets = _cached_offsets(("line", length))
+    if offsets is not None:
+        return _translate(offsets, x0, z0)
+
+    xs, zs = array("i"), array("i")
+    x, z = 0, 0
     half = 5
+    width = 2 * half + 1
+    scan_tick = bot._scan_tick
 
     for _ in range(length):
         # generar todas las coordenadas dentro del grosor del cubo en z
-        for dz in range(-half, half + 1):
-            coords.append((x, z + dz))
+        # (la columna entera de golpe, sin un append por celda)
+        xs.extend(repeat(x, width))
+        zs.extend(range(z - half, z + half + 1))
         x += 1
-        await bot._yield_scan()
+        if scan_tick():
+            await asyncio.sleep(0)
 
-    return coords
+    _store_offsets(("line", length), (xs, zs))
+    return _translate((xs, zs), x0, z0)
 
 
 
-async def search_spiral(bot, start_x: int, start_z: int, radius: int):
+async def search_spiral(bot, start_x: int, start_z: int, radius: int) -> Tuple[array, array]:
     """Devuelve coordenadas en espiral alrededor de start_x,start_z hasta el radio dado."""
-    coords: List[Tuple[int, int]] = []
-    cx, cz = start_x, start_z
+    offsets = _cached_offsets(("spiral", radius))
+    if offsets is not None:
+        return _translate(offsets, start_x, start_z)
+
+    xs, zs = array("i"), array("i")
+    cx, cz = 0, 0
     dx, dz = 1, 0
     steps = 1
     x, z = cx, cz
-    visited = set()
+    scan_tick = bot._scan_tick
 
+    # La espiral nunca pasa dos veces por la misma celda: cada tramo se
+    # añade entero, sin conjunto de visitadas
     while max(abs(x - cx), abs(z - cz)) <= radius:
         for _ in range(2):
-            for _ in range(steps):
-                if (x, z) not in visited:
-                    coords.append((x, z))
-                    visited.add((x, z))
-                x += dx
-                z += dz
+            if dx:
+                xs.extend(range(x, x + dx * steps, dx))
+                zs.extend(repeat(z, steps))
+            else:
+                xs.extend(repeat(x, steps))
+                zs.extend(range(z, z + dz * steps, dz))
+            x += dx * steps
+            z += dz * steps
             dx, dz = -dz, dx
         steps += 1
-        await bot._yield_scan()
+        if scan_tick():
+            await asyncio.sleep(0)
 
-    return coords
+    _store_offsets(("spiral", radius), (xs, zs))
+    return _translate((xs, zs), start_x, start_z)
 
 
-async def search_random(bot, x0: int, z0: int, count: int):
+async def search_random(bot, x0: int, z0: int, count: int) -> Tuple[array, array]:
     """Devuelve `count` coordenadas aleatorias considerando el grosor del cubo."""
-    coords: List[Tuple[int, int]] = []
+    xs, zs = array("i"), array("i")
     radius = count
     half = 5
+    width = 2 * half + 1
+    scan_tick = bot._scan_tick
+    seen = set()
+    centers = set()
 
     for _ in range(count):
         rx = x0 + random.randint(-radius, radius)
         rz = z0 + random.randint(-radius, radius)
-        # generar todas las coordenadas del grosor del cubo alrededor del punto aleatorio
-        for dx_offset in range(-half, half + 1):
-            for dz_offset in range(-half, half + 1):
-                coords.append((rx + dx_offset, rz + dz_offset))
-        await bot._yield_scan()
-
-    return coords
-
-
-
-
-
-
-
+        # Un centro repetido no aporta ninguna celda nueva
+        if (rx, rz) in centers:
+            if scan_tick():
+                await asyncio.sleep(0)
+            continue
+        centers.add((rx, rz))
+
+        # generar todas las coordenadas del grosor del cubo alrededor del punto
+        # aleatorio (x exterior, z interior); los cuadrados pueden solaparse,
+        # así que solo se añaden las celdas aún no vistas
+        xr = range(rx - half, rx + half + 1)
+        zr = range(rz - half, rz + half + 1)
+        fresh = [c for c in product(xr, zr) if c not in seen]
+        if len(fresh) == width * width:
+            xs.extend(chain.from_iterable(map(repeat, xr, repeat(width))))
+            zs.extend(chain.from_iterable(repeat(zr, width)))
+        else:
+            xs.extend(x for x, _ in fresh)
+            zs.extend(z for _, z in fresh)
+        seen.update(fresh)
+        if scan_tick():
+            await asyncio.sleep(0)
+
+    return xs, zs
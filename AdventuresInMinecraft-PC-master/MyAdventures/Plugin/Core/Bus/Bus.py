@@ -1,13 +1,93 @@
+import fnmatch
+import os
+import re
+from itertools import chain
+
+from ..Logger.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def bus_sync(callback):
+    """Marca un handler síncrono: el bus lo llama directamente, sin await."""
+    callback._bus_sync = True
+    return callback
+
+
 class MessageBus:
-    def __init__(self):
+    def __init__(self, debug=None):
         self.subscribers = {}
+        # msg_type -> target -> handlers que solo reciben mensajes para ese target
+        self.targeted = {}
+        # Suscripciones con comodín ("*", "command.*.v1"...): patrón original,
+        # target, match del regex compilado una sola vez y lista de handlers
+        self._glob_subs = []
+        # (msg_type, target) -> tupla final de handlers; se vacía al suscribir
+        self._dispatch = {}
 
-    def subscribe(self, msg_type, callback):
-        if msg_type not in self.subscribers:
-            self.subscribers[msg_type] = []
-        self.subscribers[msg_type].append(callback)
+        # Tap de depuración opcional (BUS_DEBUG=1): un handler síncrono en "*"
+        # que solo registra el mensaje, sin coroutine por publicación
+        if debug is None:
+            debug = os.environ.get("BUS_DEBUG", "") not in ("", "0")
+        if debug:
+            self.subscribe("*", bus_sync(self._debug_tap))
+
+    @staticmethod
+    def _debug_tap(msg):
+        logger.debug("Bus message %s -> %s", msg.get("type"), msg.get("target"))
+
+    def subscribe(self, msg_type, callback, target=None):
+        """
+        Registra callback para msg_type, que puede llevar comodines
+        ("command.*.v1"). Con target, el bus solo le entrega los mensajes
+        dirigidos a ese target o a "*".
+        """
+        if "*" in msg_type:
+            for glob, glob_target, _, subs in self._glob_subs:
+                if glob == msg_type and glob_target == target:
+                    break
+            else:
+                subs = []
+                match = re.compile(fnmatch.translate(msg_type)).match
+                self._glob_subs.append((msg_type, target, match, subs))
+        elif target is None:
+            subs = self.subscribers.setdefault(msg_type, [])
+        else:
+            subs = self.targeted.setdefault(msg_type, {}).setdefault(target, [])
+        # Un mismo handler solo se registra una vez por tipo de mensaje
+        if any(cb == callback for cb, _ in subs):
+            return
+        is_sync = getattr(callback, "_bus_sync", False)
+        subs.append((callback, is_sync))
+        self._dispatch.clear()
+
+    def _resolve(self, msg_type, target):
+        """Orden de entrega: exactos, comodines, y después los dirigidos a target."""
+        subscribers = list(self.subscribers.get(msg_type, ()))
+        globs = [(glob_target, subs) for _, glob_target, match, subs in self._glob_subs
+                 if match(msg_type)]
+        subscribers.extend(chain.from_iterable(subs for t, subs in globs if t is None))
+
+        by_target = self.targeted.get(msg_type, {})
+        if target == "*":
+            subscribers.extend(chain.from_iterable(by_target.values()))
+            subscribers.extend(chain.from_iterable(subs for t, subs in globs if t is not None))
+        else:
+            subscribers.extend(by_target.get(target, ()))
+            subscribers.extend(chain.from_iterable(subs for t, subs in globs
+                                                   if t is not None and t == target))
+        return tuple(subscribers)
 
     async def publish(self, msg):
-        subscribers = self.subscribers.get(msg["type"], []) + self.subscribers.get("*", [])
-        for cb in subscribers:
-            await cb(msg)
+        # Los handlers de cada (tipo, target) se resuelven una sola vez; en el
+        # camino caliente solo queda una consulta al diccionario
+        key = (msg["type"], msg.get("target"))
+        subscribers = self._dispatch.get(key)
+        if subscribers is None:
+            subscribers = self._dispatch[key] = self._resolve(*key)
+
+        for cb, is_sync in subscribers:
+            if is_sync:
+                cb(msg)
+            else:
+                await cb(msg)
@@ -46,7 +46,9 @@ async def main():
     shared_bus = MessageBus()
 
     explorer_bot = ExplorerBot(agent_id="ExplorerBot", bus=shared_bus)
-    explorer_bot.terrain.mc = mc  # conectar MCPI al bot
+    # Conexión MCPI propia: el explorador lee alturas desde su hilo de
+    # terreno y no puede compartir socket con el listener del chat
+    explorer_bot.terrain.mc = Minecraft.create("localhost", 4711)
 
     builder_bot = BuilderBot(agent_id="BuilderBot", bus=shared_bus)
     # Si tienes otros bots, créalos aquí:
@@ -87,10 +89,27 @@ async def main():
         await asyncio.sleep(1)
 
 
+# --------------------------
+# Event loop
+# --------------------------
+def install_event_loop_policy():
+    """Usa uvloop si está instalado; en Windows, el ProactorEventLoop."""
+    try:
+        import uvloop
+    except ImportError:
+        if sys.platform == "win32":
+            asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+        return
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.info("Usando uvloop como event loop")
+
+
 # --------------------------
 # Entry point
 # --------------------------
 if __name__ == "__main__":
+    install_event_loop_policy()
     try:
         asyncio.run(main())
     except KeyboardInterrupt: